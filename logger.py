@@ -1,8 +1,15 @@
 import logging
 import logging.config
 
+# Logger configured by the first `get_logger` call, returned by later calls.
+_LOGGER: logging.Logger | None = None
+
 
 def get_logger() -> logging.Logger:
+    global _LOGGER
+    if _LOGGER is not None:
+        return _LOGGER
+
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -27,7 +34,7 @@ def get_logger() -> logging.Logger:
                 "level": "DEBUG",
                 "formatter": "verbose",
                 "filename": ".log",
-                "mode": "w",
+                "mode": "a",  # Processes importing the logger must not truncate each other's log.
                 "encoding": "utf-8"
             }
         },
@@ -39,7 +46,7 @@ def get_logger() -> logging.Logger:
         }
     }
 
-    logger = logging.getLogger("local_logger")
     logging.config.dictConfig(logging_config)
+    _LOGGER = logging.getLogger("local_logger")
 
-    return logger
+    return _LOGGER
@@ -1,26 +1,70 @@
 """Contains a class to parse metrics for each commit in a git repository."""
 
+import ast
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import csv
+from datetime import datetime, timezone
 from enum import Enum
-import json
+from functools import cached_property
+import logging
 import os
+import pickle
 from time import perf_counter
 import re
-import queue
+import sqlite3
+from statistics import fmean
+from typing import TYPE_CHECKING, Iterator, TextIO
 
 import git
-import pandas as pd
-from pydriller import Repository, Commit
 import radon
 import radon.complexity
-from radon.cli import Config
-from radon.cli.harvest import CCHarvester, RawHarvester, HCHarvester, MIHarvester
+import radon.metrics
+import radon.raw
+import radon.visitors
 
 from logger import get_logger
 
+if TYPE_CHECKING:
+    from _csv import _writer
+
 DATA_DIR = "data"
 
+# Number of files kept in the per-file metrics cache of each worker process.
+BLOB_CACHE_SIZE = 20_000
+
+# Number of directory listings kept in the python file listing cache of each worker process.
+_TREE_CACHE_SIZE = 2_000
+
 logger = get_logger()
 
+# Radon analysis settings, shared by all commits.
+_NO_ASSERT = True  # Do not count assert statements in cyclomatic complexity.
+_COUNT_MULTI = True  # Count multiline strings as comment lines as well, for maintainability index.
+
+# Raw metrics summed across files of a commit.
+_RAW_KEYS = ("LOC",  # Lines of code (total).
+             "LLOC",  # Logical lines of code (containing exactly one statement).
+             "SLOC",  # Source lines of code.
+             "comments")  # Comment lines.
+
+# Halstead's metrics averaged across files of a commit.
+_HALSTEAD_KEYS = ("vocabulary", "length", "volume", "difficulty", "effort", "time", "bugs")
+
+# Version of the per-file metrics cache files, increased whenever the stored metrics change.
+_BLOB_CACHE_FORMAT = 2
+
+# Default branch line in the output of `git remote show`.
+_HEAD_BRANCH_RE = re.compile(r"\s*HEAD branch:\s*(.*)")
+
+# Columns of the results csv file, in order.
+_RESULT_FIELDS = (
+    "ID", "hash", "author", "date", "commit_message", "is_merge", "lines_changed", "insertions", "deletions",
+    *("radon_" + key for key in _RAW_KEYS),
+    "radon_avg_cc", "radon_avg_MI",
+    *("radon_avg_" + key for key in _HALSTEAD_KEYS),
+)
+
 
 class HarvesterOutcome(Enum):
     """Errors that can occur during metrics harvesting."""
@@ -29,6 +73,311 @@ class HarvesterOutcome(Enum):
     INVALID_CODE = 2
 
 
+class CommitHarvester:
+    """Compute software metrics for single commits of a repository, without checking them out."""
+
+    def __init__(self, repo_dir: str, blob_cache_size: int = BLOB_CACHE_SIZE,
+                 persisted_metrics: sqlite3.Connection | None = None):
+        """
+        Open the repository for reading.
+
+        :param repo_dir: path to the repository
+        :param blob_cache_size: maximum number of files kept in the per-file metrics cache
+        :param persisted_metrics: per-file metrics cache computed by previous runs, opened by `_open_blob_cache`
+        """
+        self.repo = git.Repo(repo_dir)
+
+        # Metrics from previous runs are read on cache misses, they are never all loaded in memory.
+        self._persisted_blob_metrics = persisted_metrics
+        # Metrics of files analyzed by this harvester, not yet persisted.
+        self.new_blob_metrics: dict[str, dict] = {}
+
+        # Per-file metrics keyed by blob SHA, least recently used first.
+        # Most files are unchanged between commits, so they are only analyzed once.
+        self._blob_metric_cache: OrderedDict[str, dict] = OrderedDict()
+        self.blob_cache_size = blob_cache_size
+
+        # Outcome and error message of files that could not be analyzed, keyed by blob SHA.
+        # Broken files often stay unchanged for many commits, they are only parsed once.
+        self._blob_failures: dict[str, tuple[HarvesterOutcome, str]] = {}
+
+        # Python blobs of each directory grouped by depth, keyed by tree SHA and path, least recently used first.
+        # Most directories are unchanged between commits, so only the changed ones are listed again.
+        self._tree_blob_cache: OrderedDict[tuple[str, str], tuple[tuple[git.Blob, ...], ...]] = OrderedDict()
+
+        # Python blobs and metrics of the last computed commit. Commits whose python files are all unchanged
+        # (e.g. only non-python files, hidden files or file modes were modified) reuse the same metrics.
+        self._last_commit_blobs: tuple[str, ...] | None = None
+        self._last_commit_metrics: dict[str, float] | None = None
+
+    def get_metrics(self, commit_hash: str) -> tuple[dict[str, float] | None, HarvesterOutcome]:
+        """
+        Compute software metrics for given commit, reading its python files directly from the git object store.
+        Computes total raw metrics (LOC, LLOC, SLOC, comments), and average of other metrics.
+        """
+        blobs = list(self._iter_python_blobs(commit_hash))
+        n_files = len(blobs)
+
+        blob_shas = tuple(blob.hexsha for blob in blobs)
+        if blob_shas == self._last_commit_blobs:
+            return self._last_commit_metrics.copy(), HarvesterOutcome.SUCCESS
+
+        # Raw metrics, in `_RAW_KEYS` order. Summed across the commit.
+        raw_totals = [0] * len(_RAW_KEYS)
+
+        # Unit complexity metrics. Per-file metrics are preallocated and filled by index.
+        cc_count, cc_total = 0, 0  # Cyclomatic complexity. Per function, counted and summed by file.
+        mi_values = [0.0] * n_files  # Maintainability index. Per file.
+        halstead_rows = [()] * n_files  # Halstead's complexity. Per file, as `_HALSTEAD_KEYS` values.
+
+        for i, blob in enumerate(blobs):
+            # The first file that cannot be analyzed stops analysis of the whole commit.
+            failure = self._blob_failures.get(blob.hexsha)
+            if failure is None:
+                try:
+                    file_metrics = self._get_blob_metrics(blob)
+                except Exception as e:
+                    failure = self._blob_failures[blob.hexsha] = (self._failure_outcome(e), str(e))
+            if failure is not None:
+                outcome, error = failure
+                if outcome != HarvesterOutcome.PYTHON_VERSION_2:
+                    logger.info("Error in harvester at %s: %s", blob.path, error)
+                return None, outcome
+
+            for k, value in enumerate(file_metrics["raw"]):
+                raw_totals[k] += value
+            cc_count += file_metrics["cc"][0]
+            cc_total += file_metrics["cc"][1]
+            mi_values[i] = file_metrics["mi"]
+            halstead_rows[i] = file_metrics["hc"]
+
+        # Each Halstead's metric is averaged over its column of per-file values.
+        if n_files:
+            halstead_avgs = [self._metric_avg(values) for values in zip(*halstead_rows)]
+        else:
+            halstead_avgs = [None] * len(_HALSTEAD_KEYS)
+
+        # Compute average of each metric, across the commit.
+        metric_dict = {
+            **{"radon_" + key: total for key, total in zip(_RAW_KEYS, raw_totals)},
+            # Complexities are integers, so their sum is exact and equal to the mean of all of them.
+            "radon_avg_cc": cc_total / cc_count if cc_count else None,
+            "radon_avg_MI": self._metric_avg(mi_values),
+            **{"radon_avg_" + key: avg for key, avg in zip(_HALSTEAD_KEYS, halstead_avgs)},
+        }
+
+        self._last_commit_blobs = blob_shas
+        self._last_commit_metrics = metric_dict
+
+        return metric_dict.copy(), HarvesterOutcome.SUCCESS
+
+    def _get_blob_metrics(self, blob: git.Blob) -> dict:
+        """
+        Get metrics of a single python file, from cache if the same blob was analyzed before.
+        Raises an exception if the file could not be analyzed.
+        """
+        file_metrics = self._blob_metric_cache.get(blob.hexsha)
+        if file_metrics is not None:
+            self._blob_metric_cache.move_to_end(blob.hexsha)
+            return file_metrics
+
+        file_metrics = self._get_persisted_blob_metrics(blob.hexsha)
+        if file_metrics is None:
+            file_metrics = self._analyze_source(self._read_source(blob))
+            self.new_blob_metrics[blob.hexsha] = file_metrics
+
+        self._blob_metric_cache[blob.hexsha] = file_metrics
+        if len(self._blob_metric_cache) > self.blob_cache_size:
+            self._blob_metric_cache.popitem(last=False)
+
+        return file_metrics
+
+    def _get_persisted_blob_metrics(self, blob_sha: str) -> dict | None:
+        """Get metrics of a single python file computed by a previous run, None if there are none."""
+        if self._persisted_blob_metrics is None:
+            return None
+        row = self._persisted_blob_metrics.execute(
+            "SELECT metrics FROM blob_metrics WHERE sha = ?", (blob_sha,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    @staticmethod
+    def _failure_outcome(error: Exception) -> HarvesterOutcome:
+        """Outcome of a commit containing a file whose analysis raised given error."""
+        if isinstance(error, SyntaxError) and str(error).startswith(
+                "Missing parentheses in call to 'print'. Did you mean print(...)?"):
+            return HarvesterOutcome.PYTHON_VERSION_2
+        return HarvesterOutcome.INVALID_CODE
+
+    @staticmethod
+    def _analyze_source(source: str) -> dict:
+        """
+        Compute metrics of python source code. The source is parsed and tokenized once, the syntax tree and
+        raw metrics are shared by all metrics.
+        """
+        tree = ast.parse(source)
+        raw = radon.raw.analyze(source)
+        # Only the report of the whole file is used, `radon.metrics.h_visit_ast` also reports each function.
+        halstead = radon.metrics.halstead_visitor_report(radon.visitors.HalsteadVisitor.from_ast(tree))
+
+        # Maintainability index from the same parameters `radon.metrics.mi_visit` computes by parsing the
+        # source again. Unlike the cyclomatic complexity metric, radon counts assert statements here.
+        mi_complexity = radon.visitors.ComplexityVisitor.from_ast(tree).total_complexity
+        comment_lines = raw.comments + (raw.multi if _COUNT_MULTI else 0)
+        comments_percent = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+
+        cc_blocks = radon.complexity.cc_visit_ast(tree, no_assert=_NO_ASSERT)
+
+        return {
+            "raw": (raw.loc, raw.lloc, raw.sloc, raw.comments),
+            "cc": (len(cc_blocks), sum(block.complexity for block in cc_blocks)),
+            "mi": radon.metrics.mi_compute(halstead.volume, mi_complexity, raw.lloc, comments_percent),
+            "hc": tuple(getattr(halstead, key) for key in _HALSTEAD_KEYS),
+        }
+
+    def _iter_python_blobs(self, commit_hash: str) -> Iterator[git.Blob]:
+        """
+        Iterate python source blobs in the tree of given commit, breadth first as `git.Tree.traverse` does.
+        Hidden files and directories are skipped, as radon does when walking a directory.
+        """
+        tree = self.repo.commit(commit_hash).tree
+        for level in self._get_tree_python_blobs(tree):
+            yield from level
+
+    def _get_tree_python_blobs(self, tree: git.Tree) -> tuple[tuple[git.Blob, ...], ...]:
+        """
+        Get python source blobs of a tree, grouped by their depth below it. Listings of unchanged
+        subdirectories are taken from cache, so the cost of a commit depends on the directories it changed.
+        """
+        key = (tree.hexsha, tree.path)
+        levels = self._tree_blob_cache.get(key)
+        if levels is not None:
+            self._tree_blob_cache.move_to_end(key)
+            return levels
+
+        top_blobs = []
+        subtree_levels = []
+        for item in tree:
+            if item.name.startswith("."):
+                continue
+            if item.type == "tree":
+                subtree_levels.append(self._get_tree_python_blobs(item))
+            elif item.type == "blob" and item.name.endswith(".py") and item.mode != git.Blob.link_mode:
+                top_blobs.append(item)
+
+        # Blobs at each depth are ordered by their directory, as a breadth first traversal yields them.
+        levels = (tuple(top_blobs),) + tuple(
+            tuple(blob for sublevels in subtree_levels if depth < len(sublevels) for blob in sublevels[depth])
+            for depth in range(max(map(len, subtree_levels), default=0))
+        )
+
+        self._tree_blob_cache[key] = levels
+        if len(self._tree_blob_cache) > _TREE_CACHE_SIZE:
+            self._tree_blob_cache.popitem(last=False)
+
+        return levels
+
+    @staticmethod
+    def _read_source(blob: git.Blob) -> str:
+        """Read source code of a blob, decoded as if the file was opened in text mode."""
+        source = blob.data_stream.read().decode("utf-8")
+        return source.replace("\r\n", "\n").replace("\r", "\n")
+
+    @staticmethod
+    def _metric_avg(metrics: list) -> float | None:
+        """Compute average of metrics, exactly rounded whatever the order of the files."""
+        if not metrics:
+            return None
+        return fmean(metrics)
+
+
+# Result of a commit computed by a worker: hash, software metrics, outcome, seconds taken to compute them
+# and metrics of newly analyzed files.
+_HarvestResult = tuple[str, dict[str, float] | None, HarvesterOutcome, float, dict[str, dict]]
+
+# Harvester owned by the current worker process, created by `_init_worker`.
+_worker_harvester: CommitHarvester | None = None
+
+
+def _init_worker(repo_dir: str, blob_cache_path: str, blob_cache_size: int) -> None:
+    """Initialize a worker process with its own commit harvester, reading metrics of previous runs."""
+    global _worker_harvester
+    # The cache is created by the parent process, workers only read from it.
+    _worker_harvester = CommitHarvester(
+        repo_dir, blob_cache_size=blob_cache_size, persisted_metrics=sqlite3.connect(blob_cache_path),
+    )
+
+
+def _harvest_one(commit_hash: str) -> _HarvestResult:
+    """
+    Compute software metrics for a commit in the current worker process.
+    Metrics of files analyzed for the first time are returned as well, to be persisted by the parent process.
+    """
+    start_time = perf_counter()
+    sw_metrics, outcome = _worker_harvester.get_metrics(commit_hash)
+    time_taken = perf_counter() - start_time
+    new_blob_metrics = _worker_harvester.new_blob_metrics
+    _worker_harvester.new_blob_metrics = {}
+    return commit_hash, sw_metrics, outcome, time_taken, new_blob_metrics
+
+
+def _harvest_batch(commit_hashes: list[str]) -> list[_HarvestResult]:
+    """Compute software metrics for consecutive commits in the current worker process."""
+    return [_harvest_one(commit_hash) for commit_hash in commit_hashes]
+
+
+def _harvest_in_order(executor: Executor, commit_hashes: list[str], max_pending: int,
+                      batch_size: int = 8) -> Iterator[_HarvestResult]:
+    """
+    Compute software metrics for commits in a worker pool, yielding results in commit order.
+    Consecutive commits are sent to a worker together, as they share most files. Batches are submitted
+    as results are consumed, so at most `max_pending` batches are queued or running at a time.
+    """
+    pending: deque[Future] = deque()
+    for start in range(0, len(commit_hashes), batch_size):
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+        pending.append(executor.submit(_harvest_batch, commit_hashes[start:start + batch_size]))
+    while pending:
+        yield from pending.popleft().result()
+
+
+def _open_blob_cache(path: str) -> sqlite3.Connection:
+    """
+    Open the per-file metrics cache of a repository, keyed by blob SHA, created if it does not exist.
+    Metrics are read and written one file at a time, the cache is never loaded in memory as a whole.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        return _connect_blob_cache(path)
+    except sqlite3.DatabaseError as e:
+        logger.warning("Could not open metric cache %s, starting a new one: %s", path, e)
+        for cache_file in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+        return _connect_blob_cache(path)
+
+
+def _connect_blob_cache(path: str) -> sqlite3.Connection:
+    """Connect to a per-file metrics cache, creating its table if missing."""
+    connection = sqlite3.connect(path)
+    # Workers read the cache while the parent process writes to it. Commits are not synced to disk one by one,
+    # a crash may only lose the metrics of the last files, which are computed again.
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS blob_metrics (sha TEXT PRIMARY KEY, metrics BLOB NOT NULL)")
+    return connection
+
+
+def _save_blob_metrics(connection: sqlite3.Connection, blob_metrics: dict[str, dict]) -> None:
+    """Add per-file metrics keyed by blob SHA to the cache. Files already in the cache are kept."""
+    with connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO blob_metrics (sha, metrics) VALUES (?, ?)",
+            ((sha, pickle.dumps(metrics, protocol=pickle.HIGHEST_PROTOCOL)) for sha, metrics in blob_metrics.items()),
+        )
+
+
 class MetricParse:
     """Parse metrics from a git repository."""
 
@@ -50,291 +399,310 @@ class MetricParse:
             self.repo = git.Repo(self.repo_dir)
         else:
             try:
-                self.repo = git.Repo.clone_from(self.repo_url, self.repo_dir)
+                # Only the default branch is analyzed. All blobs are cloned in one pack, the line counts of
+                # `git log --numstat` read every changed blob. Files are read from the object store,
+                # so no working tree is checked out.
+                self.repo = git.Repo.clone_from(
+                    self.repo_url, self.repo_dir, bare=True, multi_options=["--single-branch"],
+                )
             except git.GitCommandError:
                 self.repo = None
-                return
-
-        self.repo.git.checkout(self.main_branch)
 
     @staticmethod
     def shorten_commit_message(commit_message: str, max_len: int = 100) -> str:
         """Shorten commit message for logging."""
-        msg = commit_message.replace("\n", " ")
-        if len(msg) > max_len:
-            msg = msg[:max_len]
-            msg += "..."
-        return msg
+        # Only the kept part of the message is processed, replacing newlines does not change its length.
+        if len(commit_message) > max_len:
+            return commit_message[:max_len].replace("\n", " ") + "..."
+        return commit_message.replace("\n", " ")
 
-    def _get_unprocessed_commit_hash_range(self) -> tuple[str | None, str | None, int]:
+    def _iter_commit_info(self, branch: str) -> Iterator[dict]:
         """
-        Get start and end commit hashes not included in the repository's results table
-        and number of computed commits.
+        Iterate info of commits in given branch that modify python files, from the oldest.
+        All commits are read from a single `git log` call. Merge commits are not diffed by `git log`,
+        so they never count as modifying python files.
         """
-        if not os.path.exists(self._default_save_path):
-            return None, None, 0
-
-        results_df = pd.read_csv(self._default_save_path)
-        if results_df.empty:
-            return None, None, 0
+        log = self.repo.git.log(
+            branch, "--reverse", "--numstat", "-z", "-M", "--no-use-mailmap",
+            "--format=%H%x00%P%x00%an%x00%ct%x00%B",
+            stdout_as_string=False,
+        )
+        # Each commit is 5 fields, followed by its numstat entries: "insertions\tdeletions\tpath", or
+        # "insertions\tdeletions\t" followed by the old and new path of a renamed file.
+        tokens = log.split(b"\0")
+        i = 0
+        while i + 5 <= len(tokens):
+            commit_hash, parents, author, timestamp, message = tokens[i:i + 5]
+            i += 5
+
+            insertions = deletions = 0
+            modifies_python = False
+            while i < len(tokens) and b"\t" in tokens[i]:
+                added, removed, path = tokens[i].lstrip(b"\n").split(b"\t", 2)
+                i += 1
+                if not path:
+                    path = tokens[i + 1]
+                    i += 2
+                # Binary files have no line counts.
+                insertions += int(added) if added != b"-" else 0
+                deletions += int(removed) if removed != b"-" else 0
+                modifies_python = modifies_python or path.endswith(b".py")
+
+            if not modifies_python:
+                continue
 
-        # Reverse order: from the very first commit to the first in the results table.
-        first_hash = None
-        last_hash = results_df["hash"].iloc[0]
+            yield {
+                "hash": commit_hash.decode("ascii"),
+                "author": author.decode("utf-8", "replace"),
+                "date": datetime.fromtimestamp(int(timestamp), timezone.utc),
+                "commit_message": message.decode("utf-8", "replace").strip(),
+                "is_merge": len(parents.split()) > 1,
+                "lines_changed": insertions + deletions,
+                "insertions": insertions,
+                "deletions": deletions,
+            }
 
-        return first_hash, last_hash, len(results_df)
+    @staticmethod
+    def _get_computed_commit_hashes(save_path: str) -> set[str]:
+        """
+        Get hashes of commits already in a results csv file, e.g. saved by an interrupted run.
+        A file with other columns, e.g. saved by an earlier version, is removed and computed again.
+        A partially written last row, left by a killed run, is removed from the file.
+        """
+        if not os.path.exists(save_path):
+            return set()
+
+        # Rows are written whole and end with a newline, anything after the last one is a row cut off by a killed
+        # run. It is cut from the bytes of the file, as it may end in the middle of a multibyte character.
+        with open(save_path, "rb+") as f:
+            content = f.read()
+            rows_end = content.rfind(b"\n") + 1
+            partial_row = rows_end != len(content)
+            if partial_row:
+                f.truncate(rows_end)
+
+        with open(save_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            rows = list(reader) if header == list(_RESULT_FIELDS) else None
+
+        if rows is None:
+            logger.warning("Results file %s has different columns, computing it again.", save_path)
+            os.remove(save_path)
+            return set()
+
+        # A row cut off after a newline within its commit message has too few columns.
+        if rows and len(rows[-1]) != len(_RESULT_FIELDS):
+            partial_row = True
+            rows.pop()
+            with open(save_path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(header)
+                writer.writerows(rows)
+        if partial_row:
+            logger.warning("Removed partially written last row of %s.", save_path)
+
+        hash_col = _RESULT_FIELDS.index("hash")
+        return {row[hash_col] for row in rows}
+
+    def save_metrics_for_each_commit(self, save_path: str = None, num_workers: int | None = None,
+                                     blob_cache_size: int = BLOB_CACHE_SIZE) -> None:
+        """
+        Save info and metrics for each commit in main branch in a csv file.
 
-    def save_metrics_for_each_commit(self, save_path: str = None) -> None:
-        """Save info and metrics for each commit in main branch in a csv file."""
+        :param save_path: path of the results csv file, default path is used if None
+        :param num_workers: number of processes computing commit metrics, number of CPUs if None
+        :param blob_cache_size: maximum number of files kept in the per-file metrics cache of each process
+        """
         if self.repo is None:
             return
 
         branch_main = self.main_branch
         if branch_main is None:
-            logger.info(f"Could not find main branch for {self.repo_name}.")
+            logger.info("Could not find main branch for %s.", self.repo_name)
             return
 
-        commit_metrics_list = []
-        # Unprocessed commit range. For when autosave is used.
-        start_hash, end_hash, num_computed = self._get_unprocessed_commit_hash_range()
-        commit_count = int(self.repo.git.rev_list('--count', 'HEAD')) - num_computed
-        traverser = Repository(
-            self.repo_dir,
-            only_in_branch=branch_main,
-            only_modifications_with_file_types=[".py"],
-            # order="reverse",
-            # from_commit=start_hash,
-            # to_commit=end_hash,
-        ).traverse_commits()
-
-        recent_outcomes = queue.Queue(maxsize=100)
-        commit_start_time = perf_counter()
-        for i, commit in enumerate(traverser):
-            time_taken = perf_counter() - commit_start_time
-            commit_start_time = perf_counter()
-
-            print(
-                'repo', self.repo_name,
-                '| commit', i + 1, 'of', commit_count,
-                '| author:', commit.author.name,
-                '| date:', commit.committer_date,
-                '| lines_changed: ', f'{commit.lines} (+{commit.insertions} -{commit.deletions})',
-                '| time taken:', f'{time_taken:.2f}s',
-                '\n\tcommit message:', self.shorten_commit_message(commit.msg)
-            )
-
-            if time_taken > 60 or (time_taken > 20 and commit_count - i > 1000):
-                logger.info(f"Estimated time too high. Skipped repo {self.repo_name}.")
-                if os.path.exists(self._default_save_path):
-                    os.remove(self._default_save_path)
-                break
-
-            commit_metric_dict = {
-                "hash": commit.hash,
-                "author": commit.author.name,
-                "date": commit.committer_date,
-                "commit_message": commit.msg,
-                "is_merge": commit.merge,
-                "lines_changed": commit.lines,
-                "insertions": commit.insertions,
-                "deletions": commit.deletions,
-                "dmm_unit_size": commit.dmm_unit_size,
-                "dmm_unit_complexity": commit.dmm_unit_complexity,
-                "dmm_unit_interfacing": commit.dmm_unit_interfacing,
-            }
-
-            sw_metrics, outcome = self._get_metrics(commit)
-
-            # If enough recent commits failed, stop processing.
-            if sum(recent_outcomes.queue) > 5:
-                logger.info(f"Too many recent errors. Stopped processing for {self.repo_name}.")
-                break
-            if recent_outcomes.full():
-                recent_outcomes.get()
-
-            if sw_metrics is None:
-                # Shortened message for logging.
-                commit_msg_short = self.shorten_commit_message(commit.msg)
-
-                if os.path.exists(self._default_save_path):
-                    os.remove(self._default_save_path)
-
-                if outcome == HarvesterOutcome.PYTHON_VERSION_2:
+        result_path = save_path or self._default_save_path
+        # Results file and its writer, opened when the first commit is computed.
+        result_file = None
+        result_writer = None
+        num_saved = 0
+        # Set when processing stops early, results of the repository are removed.
+        discard_results = False
+        # Commits saved by a previous, interrupted run are not computed again.
+        computed_hashes = self._get_computed_commit_hashes(result_path)
+        num_computed = len(computed_hashes)
+
+        # Commit info is collected up front, software metrics are computed by the worker pool.
+        commit_info_list = [
+            info for info in self._iter_commit_info(branch_main) if info["hash"] not in computed_hashes
+        ]
+
+        # Commits left to compute, counted from the traversal itself rather than a separate `git rev-list`.
+        commit_count = len(commit_info_list)
+
+        # Files analyzed by previous runs are not analyzed again, new ones are added as workers report them.
+        blob_cache = _open_blob_cache(self._blob_cache_path)
+
+        num_workers = num_workers or os.cpu_count()
+        executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(self.repo_dir, self._blob_cache_path, blob_cache_size),
+        )
+        try:
+            # Results are yielded in commit order, matching `commit_info_list`. Two batches per worker are kept
+            # queued, so workers are never idle and few commits are computed in vain if processing stops early.
+            results = _harvest_in_order(executor, [info["hash"] for info in commit_info_list], 2 * num_workers)
+
+            # Outcomes of the last 100 commits (1 if an error occurred) and their sum.
+            recent_outcomes = deque(maxlen=100)
+            recent_errors = 0
+            for i, (commit_metric_dict, (_, sw_metrics, outcome, time_taken, new_blob_metrics)) in enumerate(
+                    zip(commit_info_list, results)):
+                if new_blob_metrics:
+                    _save_blob_metrics(blob_cache, new_blob_metrics)
+
+                commit_hash = commit_metric_dict["hash"]
+                commit_msg = commit_metric_dict["commit_message"]
+                # Message is only shortened and formatted when it will be logged.
+                if logger.isEnabledFor(logging.INFO):
                     logger.info(
-                        f"Error computing metrics for {self.repo_name}. "
-                        + f"Invalid python version, stopped for repository at: \"{commit_msg_short}\" ({commit.hash}).")
+                        "repo %s | commit %s of %s | author: %s | date: %s | lines_changed: %s (+%s -%s) "
+                        "| time taken: %.2fs\n\tcommit message: %s",
+                        self.repo_name, i + 1, commit_count, commit_metric_dict["author"], commit_metric_dict["date"],
+                        commit_metric_dict["lines_changed"], commit_metric_dict["insertions"],
+                        commit_metric_dict["deletions"], time_taken, self.shorten_commit_message(commit_msg),
+                    )
+
+                if time_taken > 60 or (time_taken > 20 and commit_count - i > 1000):
+                    logger.info("Estimated time too high. Skipped repo %s.", self.repo_name)
+                    discard_results = True
                     break
-                elif outcome == HarvesterOutcome.INVALID_CODE:
-                    logger.info(
-                        f"Error computing metrics for {self.repo_name}. Source code could not be analyzed."
-                        + f"Skipped commit \"{commit_msg_short}\" ({commit.hash}).")
-                else:
-                    logger.info(
-                        f"Error computing metrics for {self.repo_name}. "
-                        + f"Unknown error at commit \"{commit_msg_short}\" ({commit.hash}).")
-                recent_outcomes.put(1)  # Error occurred.
-                continue
-
-            recent_outcomes.put(0)  # No error occurred.
-
-            # Add software metrics to commit metrics.
-            commit_metric_dict |= sw_metrics
-            commit_metrics_list.append(commit_metric_dict)
-
-        else:  # No break occurred, all commits processed.
-            if not commit_metrics_list:
-                logger.warning(f"Found zero computable commits for {self.repo_name}.")
-                return
-
-            logger.info(f"Successfully processed {self.repo_name}. Saving results.")
-            self._save_to_csv(commit_metrics_list, save_path)
-
-    def _save_to_csv(self, metrics_list: list, save_path: str) -> None:
-        """Save DataFrame of metrics to a csv file."""
-        if not metrics_list:
-            return
-
-        metrics_df = pd.DataFrame(metrics_list)
-
-        if save_path:
-            result_path = save_path
-        else:
-            result_path = self._default_save_path
-
-        # Merge with existing results if they exist. This allows autosave to work if implemented.
-        if os.path.exists(result_path):
-            old_df = pd.read_csv(result_path, index_col="ID", encoding="utf-8")
-            metrics_df = pd.concat([old_df, metrics_df], ignore_index=True)
-
-        metrics_df["date"] = pd.to_datetime(metrics_df["date"], utc=True)
-        metrics_df.sort_values("date", inplace=True)
-        metrics_df.reset_index(drop=True, inplace=True)
-        metrics_df.index.name = "ID"
 
-        metrics_df.to_csv(result_path, encoding="utf-8", mode="w")
+                # If enough recent commits failed, stop processing.
+                if recent_errors > 5:
+                    logger.info("Too many recent errors. Stopped processing for %s.", self.repo_name)
+                    discard_results = True
+                    break
+                # The oldest outcome leaves the window when the next one is added.
+                if len(recent_outcomes) == recent_outcomes.maxlen:
+                    recent_errors -= recent_outcomes[0]
+
+                if sw_metrics is None:
+                    # Shortened message for logging.
+                    commit_msg_short = self.shorten_commit_message(commit_msg)
+
+                    if outcome == HarvesterOutcome.PYTHON_VERSION_2:
+                        logger.info(
+                            "Error computing metrics for %s. Invalid python version, stopped for repository at: "
+                            "\"%s\" (%s).", self.repo_name, commit_msg_short, commit_hash)
+                        discard_results = True
+                        break
+                    elif outcome == HarvesterOutcome.INVALID_CODE:
+                        logger.info(
+                            "Error computing metrics for %s. Source code could not be analyzed. "
+                            "Skipped commit \"%s\" (%s).", self.repo_name, commit_msg_short, commit_hash)
+                    else:
+                        logger.info(
+                            "Error computing metrics for %s. Unknown error at commit \"%s\" (%s).",
+                            self.repo_name, commit_msg_short, commit_hash)
+                    recent_outcomes.append(1)  # Error occurred.
+                    recent_errors += 1
+                    continue
+
+                recent_outcomes.append(0)  # No error occurred.
+
+                # Rows are streamed to the file as they are computed, rows are not kept in memory until the end.
+                if result_writer is None:
+                    result_file, result_writer = self._open_csv_writer(result_path)
+                # Commit info and software metrics are both in `_RESULT_FIELDS` order, the row is built by position.
+                # IDs continue after results of previous runs, rows are ordered and renumbered by `_finalize_csv`.
+                result_writer.writerow((num_computed + num_saved, *commit_metric_dict.values(), *sw_metrics.values()))
+                num_saved += 1
+
+            else:  # No break occurred, all commits processed.
+                if not num_saved and not num_computed:
+                    logger.warning("Found zero computable commits for %s.", self.repo_name)
+                    return
+
+                logger.info("Successfully processed %s. Saving results.", self.repo_name)
+                if result_file is not None:
+                    result_file.close()
+                self._finalize_csv(result_path)
+        finally:
+            # Drop pending commits if processing stopped early.
+            executor.shutdown(cancel_futures=True)
+            if result_file is not None:
+                result_file.close()
+            if discard_results and os.path.exists(result_path):
+                os.remove(result_path)
+            # Metrics of analyzed files are kept even if the repository was skipped.
+            blob_cache.close()
 
-    def _get_metrics(self, commit: Commit) -> tuple[dict[str, float] | None, HarvesterOutcome]:
+    @staticmethod
+    def _open_csv_writer(save_path: str) -> tuple[TextIO, "_writer"]:
         """
-        Checkout parser's repo at given commit and compute software metrics for that commit.
-        Computes total raw metrics (LOC, LLOC, SLOC, comments), and average of other metrics.
+        Open a csv file for appending result rows. The header is only written when the file is created.
+        Existing results are not read back, rows are ordered and numbered by `_finalize_csv`.
         """
-        metric_dict = dict()
-
-        self.repo.git.checkout(commit.hash, force=True)
-
-        config = Config(
-            exclude=[],
-            ignore=[],
-            no_assert=True,
-            show_closures=False,
-            order=radon.complexity.SCORE,
-            show_complexity=True,
-            min='A',
-            max='F',
-            total_average=True,
-            include_ipynb=False,
-            multi=True,  # Count multiline strings as comment lines as well.
-            by_function=False,
-        )
-
-        # Dict to store lists of unit complexity metrics.
-        unit_complexity_lists = dict()
-
-        # List to store errors from harvester. Contains lists of [str, dict].
-        harvester_errors: list[list] = []
-
-        # Raw metrics. Summed across the commit.
-        raw_harvester = RawHarvester([self.repo_dir], config)
-        raw_results = json.loads(raw_harvester.as_json())
-        keys = ["LOC",  # Lines of code (total).
-                "LLOC",  # Logical lines of code (containing exactly one statement).
-                "SLOC",  # Source lines of code.
-                "comments"]  # Comment lines.
-        for key in keys:
-            metric_dict["radon_" + key] = 0
-        for file_path, file in raw_results.items():
-            if "error" in file:
-                harvester_errors.append([file_path, file])
-                break
-            for key in keys:
-                metric_dict["radon_" + key] += file[key.lower()]
-
-        # Cyclomatic complexity. Per function.
-        cc_harvester = CCHarvester([self.repo_dir], config)
-        cc_results = json.loads(cc_harvester.as_json())
-        unit_complexity_lists["cc"] = []  # Cyclomatic complexity.
-        for file_path, file in cc_results.items():
-            if "error" in file:
-                harvester_errors.append([file_path, file])
-                break
-            for unit in file:
-                unit_complexity_lists["cc"].append(unit["complexity"])
-
-        # Maintainability index. Per file.
-        mi_harvester = MIHarvester([self.repo_dir], config)
-        mi_results = json.loads(mi_harvester.as_json())
-        unit_complexity_lists["MI"] = []
-        for file_path, file in mi_results.items():
-            if "error" in file:
-                harvester_errors.append([file_path, file])
-                break
-            unit_complexity_lists["MI"].append(file["mi"])
-
-        # Halstead's complexity. Per file.
-        config.by_function = False
-        hc_harvester = HCHarvester([self.repo_dir], config)
-        hc_results = json.loads(hc_harvester.as_json())
-        keys = ["vocabulary", "length", "volume", "difficulty", "effort", "time", "bugs"]
-        for key in keys:
-            unit_complexity_lists[key] = []
-        for file_path, file in hc_results.items():
-            if "error" in file:
-                harvester_errors.append([file_path, file])
-                break
-            for key in keys:
-                unit_complexity_lists[key].append(file["total"][key])
-
-        if harvester_errors:
-            for file_path, file in harvester_errors:
-                if file["error"].startswith("Missing parentheses in call to 'print'. Did you mean print(...)?"):
-                    return None, HarvesterOutcome.PYTHON_VERSION_2
-
-                logger.info(f"Error in harvester at {file_path}: {file['error']}")
-            return None, HarvesterOutcome.INVALID_CODE
-
-        # Compute average of each metric, across the commit.
-        for metric in unit_complexity_lists:
-            metric_dict["radon_avg_" + metric] = self._metric_avg(unit_complexity_lists[metric])
-
-        return metric_dict, HarvesterOutcome.SUCCESS
+        write_header = not os.path.exists(save_path)
+        result_file = open(save_path, "a", newline="", encoding="utf-8", buffering=1 << 20)
+        result_writer = csv.writer(result_file, lineterminator="\n")
+        if write_header:
+            result_writer.writerow(_RESULT_FIELDS)
+        return result_file, result_writer
 
     @staticmethod
-    def _metric_avg(metrics: list) -> float | None:
-        """Compute average of metrics."""
-        if not metrics:
-            return None
-        return sum(metrics) / len(metrics)
+    def _finalize_csv(save_path: str) -> None:
+        """Sort results in a csv file by commit date and renumber the ID column. Run once results are complete."""
+        if not os.path.exists(save_path):
+            return
 
-    @property
+        # Rows are kept as text, only dates are parsed to order them. Values are written back as they were.
+        with open(save_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(reader)
+
+        id_col = header.index("ID")
+        date_col = header.index("date")
+        for row in rows:
+            row[date_col] = datetime.fromisoformat(row[date_col]).astimezone(timezone.utc)
+        rows.sort(key=lambda row: row[date_col])
+        for i, row in enumerate(rows):
+            row[id_col] = i
+
+        with open(save_path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    @cached_property
     def _default_save_path(self) -> str:
         """Default save path for results."""
         return os.path.join(DATA_DIR, "results", self.repo_name + ".csv")
 
-    @property
+    @cached_property
+    def _blob_cache_path(self) -> str:
+        """Path of the per-file metrics cache, shared by all runs on the repository."""
+        return os.path.join(DATA_DIR, "cache", f"{self.repo_name}.v{_BLOB_CACHE_FORMAT}.sqlite")
+
+    @cached_property
     def main_branch(self) -> str:
         """Main or master branch of the parser's repository."""
 
         # Candidates named main or master.
         candidates = ["main", "master", "origin/main", "origin/master"]
-        refs = self.repo.references
+        ref_names = {ref.name for ref in self.repo.references}
         for candidate in candidates:
-            if candidate in refs:
+            if candidate in ref_names:
                 return candidate
 
         # Default branch.
         show_result = self.repo.git.remote("show", "origin")
 
-        matches = re.search(r"\s*HEAD branch:\s*(.*)", show_result)
+        matches = _HEAD_BRANCH_RE.search(show_result)
         if matches:
             default_branch = matches.group(1)
             if default_branch:
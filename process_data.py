@@ -1,6 +1,7 @@
 """Data processing module."""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import os
 from typing import Literal
 
@@ -33,29 +34,48 @@ def process_results(mode: Literal["merge"] = "merge") -> None:
 
 
 def get_results_df_list(path: str) -> list[pd.DataFrame]:
-    """Get a list of dataframes from the directory."""
-    df_list = []
-    for file in os.listdir(path):
-        if file.endswith(".csv") and file != ALL_RESULTS_FILE:
-            results = pd.read_csv(os.path.join(path, file), encoding="utf-8")
+    """
+    Get a list of dataframes from the directory. Files are read in parallel threads.
+    Commits are only kept in the first dataframe they appear in.
+    """
+    files = [file for file in os.listdir(path) if file.endswith(".csv") and file != ALL_RESULTS_FILE]
+
+    # The csv parser releases the GIL while tokenizing, so threads read files concurrently.
+    with ThreadPoolExecutor() as executor:
+        df_list = list(executor.map(lambda file: read_results_df(path, file), files))
+
+    # Duplicate commits are dropped from each dataframe before they are merged.
+    seen_hashes = set()
+    for i, results in enumerate(df_list):
+        hashes = results["hash"]
+        # Set lookups per row, `isin` would convert the growing set to an array for every dataframe.
+        is_duplicate = hashes.duplicated() | pd.Series([h in seen_hashes for h in hashes], index=hashes.index)
+        if is_duplicate.any():
+            results = results[~is_duplicate]
+            df_list[i] = results
+        seen_hashes.update(results["hash"])
+
+    return df_list
 
-            # Add repo name column to the results.
-            repo_name = file.split(".")[0]
-            results["repo_name"] = repo_name
 
-            df_list.append(results)
+def read_results_df(path: str, file: str) -> pd.DataFrame:
+    """Read results of a single repository, with a repository name column."""
+    results = pd.read_csv(os.path.join(path, file), encoding="utf-8")
 
-    return df_list
+    # Add repo name column to the results.
+    repo_name = file.split(".")[0]
+    results["repo_name"] = repo_name
+
+    return results
 
 
 def process_default(df: pd.DataFrame) -> pd.DataFrame:
     """Default data processing."""
     df.drop(columns=["ID"], inplace=True)
-    df.drop_duplicates(subset="hash", inplace=True)
     df.reset_index(drop=True, inplace=True)
     df.index.name = "ID"
 
-    df["commit_message"] = df["commit_message"].str.replace("\r\n", " ")
+    df["commit_message"] = df["commit_message"].str.replace("\r\n", " ", regex=False)
 
     return df
 
@@ -1,38 +1,80 @@
 """Schedule metrics collection for a number of repositories."""
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import os
 
-import pandas as pd
+from logger import get_logger
+from parse import BLOB_CACHE_SIZE, MetricParse
 
-from parse import MetricParse
+logger = get_logger()
 
 
-def schedule_repositories(repo_urls_csv_path: str) -> None:
+def _compute_repository(repo_url: str, num_workers: int | None, blob_cache_size: int) -> None:
+    """Compute metrics for a single repository, in its own process."""
+    metric_parse = MetricParse(repo_url)
+    metric_parse.save_metrics_for_each_commit(num_workers=num_workers, blob_cache_size=blob_cache_size)
+
+
+def schedule_repositories(repo_urls_csv_path: str, num_workers: int | None = None,
+                          blob_cache_size: int = BLOB_CACHE_SIZE, num_parallel_repos: int = 1) -> None:
     """
     Schedule metrics collection for a number of repositories, from a csv file with repository names and urls.
+    Computed repositories are recorded in a progress file next to the csv file, and skipped if scheduling
+    is interrupted and started again. A repository that raises an error is logged and not recorded, so it is
+    retried by the next run, other repositories are still computed.
 
     :param repo_urls_csv_path: path to csv file with columns `name` and `repo_url`
+    :param num_workers: number of processes computing commit metrics of each repository,
+        CPUs shared evenly between repositories if None
+    :param blob_cache_size: maximum number of files kept in the per-file metrics cache of each process
+    :param num_parallel_repos: number of repositories computed at the same time
     """
-    repo_urls = pd.read_csv(repo_urls_csv_path, encoding="utf-8")
-
-    # Column to track which repositories have been computed.
-    if "computed" not in repo_urls.columns:
-        repo_urls["computed"] = False
-
-    for i, row in repo_urls.iterrows():
-        if row["computed"]:
-            continue
-
-        repo_url = row["repo_url"]
-        if repo_url and isinstance(repo_url, str):
-            metric_parse = MetricParse(repo_url)
-            metric_parse.save_metrics_for_each_commit()
-
-        repo_urls.loc[i, "computed"] = True
-        repo_urls.to_csv(repo_urls_csv_path, index=False, encoding="utf-8")
-
-    repo_urls.drop(columns=["computed"], inplace=True)
-    repo_urls.to_csv(repo_urls_csv_path, index=False, encoding="utf-8")
+    progress_path = os.path.splitext(repo_urls_csv_path)[0] + ".progress"
+
+    computed_urls = set()
+    if os.path.exists(progress_path):
+        with open(progress_path, encoding="utf-8") as f:
+            computed_urls = set(f.read().splitlines())
+
+    with open(repo_urls_csv_path, newline="", encoding="utf-8") as f:
+        # Repositories marked by the `computed` column of earlier versions are skipped as well.
+        pending_urls = [
+            row["repo_url"] for row in csv.DictReader(f)
+            if row["repo_url"] and row["repo_url"] not in computed_urls and row.get("computed") != "True"
+        ]
+    pending_urls = list(dict.fromkeys(pending_urls))
+
+    if num_workers is None:
+        num_workers = max(1, os.cpu_count() // num_parallel_repos)
+
+    failed_urls = []
+    # Repositories are independent, each is computed in its own process with its own pool of workers.
+    with ProcessPoolExecutor(max_workers=num_parallel_repos) as executor, \
+            open(progress_path, "a", encoding="utf-8") as progress_file:
+        futures = {
+            executor.submit(_compute_repository, repo_url, num_workers, blob_cache_size): repo_url
+            for repo_url in pending_urls
+        }
+        for future in as_completed(futures):
+            repo_url = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Error computing repository %s.", repo_url)
+                failed_urls.append(repo_url)
+                continue
+
+            progress_file.write(repo_url + "\n")
+            progress_file.flush()
+
+    # Progress is kept, so running again only computes the failed repositories.
+    if failed_urls:
+        logger.warning("Could not compute %s repositories: %s", len(failed_urls), ", ".join(failed_urls))
+        return
+
+    os.remove(progress_path)
     print("Finished processing all repositories.")
 
 
@@ -43,9 +85,16 @@ def main():
     parser = argparse.ArgumentParser(description="Schedule metrics collection for a number of repositories.")
     parser.add_argument("--urls-path", default=default_urls_path,
                         help="Path to csv file with repository urls.")
+    parser.add_argument("--num-workers", type=int, default=None,
+                        help="Number of processes computing commit metrics of each repository. "
+                             "Defaults to the number of CPUs, shared between parallel repositories.")
+    parser.add_argument("--blob-cache-size", type=int, default=BLOB_CACHE_SIZE,
+                        help="Number of files whose metrics are kept in memory by each process.")
+    parser.add_argument("--parallel-repos", type=int, default=1,
+                        help="Number of repositories computed at the same time.")
     args = parser.parse_args()
 
-    schedule_repositories(args.urls_path)
+    schedule_repositories(args.urls_path, args.num_workers, args.blob_cache_size, args.parallel_repos)
 
 
 if __name__ == "__main__":